@@ -1,9 +1,14 @@
-from typing import Callable, Union
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Callable, Optional, Union
+
+import numpy as np
 
 from agentlego.parsers import DefaultParser
 from agentlego.schema import ToolMeta
 from agentlego.types import ImageIO
-from agentlego.utils import require
+from agentlego.utils import is_package_available, require
 from ..base import BaseTool
 from ..utils.diffusers import load_sd
 
@@ -16,11 +21,24 @@ class ScribbleTextToImage(BaseTool):
             the :attr:`DEFAULT_TOOLMETA`.
         parser (Callable): The parser constructor, Defaults to
             :class:`DefaultParser`.
-        model (str): The model name used to inference. Which can be found
-            in the ``diffusers`` repository.
-            Defaults to 'lllyasviel/sd-controlnet_scribble'.
         model (str): The scribble controlnet model to use. You can only choose
             "sd" by now. Defaults to "sd".
+        scheduler (str, optional): The scheduler of the diffusion pipeline.
+            If "lcm", use the LCM scheduler with the LCM-LoRA weights, which
+            only requires a few inference steps. If None, use the default
+            scheduler of the model. Defaults to "lcm".
+        inference_steps (int, optional): The number of inference steps.
+            Defaults to None, which means 4 for the "lcm" scheduler and 20
+            for others.
+        guidance_scale (float, optional): The classifier-free guidance
+            scale. Defaults to None, which means 1.0 for the "lcm" scheduler
+            and 9.0 for others.
+        safety_checker (bool): Whether to check the generated images with
+            the safety checker. Defaults to False.
+        low_vram (bool): Whether to offload the sub-models to CPU when they
+            are not running, which reduces the GPU memory usage at the cost
+            of some speed. The offloaded pipeline loads its own models
+            instead of sharing them with other tools. Defaults to False.
         device (str): The device to load the model. Defaults to 'cuda'.
     """
 
@@ -38,31 +56,112 @@ class ScribbleTextToImage(BaseTool):
                  toolmeta: Union[dict, ToolMeta] = DEFAULT_TOOLMETA,
                  parser: Callable = DefaultParser,
                  model: str = 'sd',
+                 scheduler: Optional[str] = 'lcm',
+                 inference_steps: Optional[int] = None,
+                 guidance_scale: Optional[float] = None,
+                 safety_checker: bool = False,
+                 low_vram: bool = False,
                  device: str = 'cuda'):
         super().__init__(toolmeta=toolmeta, parser=parser)
         assert model in ['sd']
-        self.model_name = model
+        if scheduler == 'lcm' and not is_package_available('peft'):
+            raise ImportError(
+                'ScribbleTextToImage with the "lcm" scheduler requires peft, '
+                'please install by `pip install peft`.')
+        self.model = model
+        self.scheduler = scheduler
+        if inference_steps is None:
+            inference_steps = 4 if scheduler == 'lcm' else 20
+        self.inference_steps = inference_steps
+        if guidance_scale is None:
+            guidance_scale = 1.0 if scheduler == 'lcm' else 9.0
+        self.guidance_scale = guidance_scale
+        self.safety_checker = safety_checker
+        self.low_vram = low_vram
         self.device = device
 
     def setup(self):
+        import torch
+
         if self.model == 'sd':
             self.pipe = load_sd(
                 controlnet='lllyasviel/sd-controlnet-scribble',
+                scheduler=self.scheduler,
+                safety_checker=self.safety_checker,
+                private=self.low_vram,
                 device=self.device,
             )
+            if self.low_vram:
+                self.pipe.enable_model_cpu_offload(device=self.device)
         self.a_prompt = 'best quality, extremely detailed, 4k, master piece'
         self.n_prompt = 'longbody, lowres, bad anatomy, bad hands, '\
                         ' missing fingers, extra digit, fewer digits, '\
                         'cropped, worst quality, low quality'
+        self._image_cache = OrderedDict()
+
+        # The negative prompt is fixed, encode it only once.
+        self._negative_prompt_embeds = None
+        if self.guidance_scale > 1.0:
+            with torch.inference_mode():
+                self._negative_prompt_embeds = self.pipe.encode_prompt(
+                    self.n_prompt,
+                    device=self.device,
+                    num_images_per_prompt=1,
+                    do_classifier_free_guidance=False,
+                )[0]
+
+    def _prepare_image(self, image: ImageIO):
+        """Convert the scribble image to a tensor on the device.
+
+        The converted tensors are cached, since the same scribble is usually
+        used repeatedly to refine the result. Image files are identified by
+        the path and the modification time, so a cache hit skips decoding.
+        Other images are identified by the pixel content.
+
+        If ``low_vram`` is True, the tensors are cached on CPU, and the
+        pipeline moves them to the device when it runs.
+        """
+        import torch
+
+        array = None
+        if image.type == 'path':
+            path = os.path.abspath(image.to_path())
+            key = (path, os.stat(path).st_mtime_ns)
+        else:
+            array = image.to_array()
+            key = (array.shape, hashlib.md5(array.tobytes()).hexdigest())
+
+        if key in self._image_cache:
+            self._image_cache.move_to_end(key)
+            return self._image_cache[key]
+
+        if array is None:
+            array = image.to_array()
+        if array.ndim != 3 or array.shape[2] != 3:
+            return image.to_pil()
+
+        # Arrays from other tools may have negative strides, like BGR to RGB
+        # flipped views, which is not supported by `torch.from_numpy`.
+        tensor = torch.from_numpy(np.ascontiguousarray(array))
+        tensor = tensor.permute(2, 0, 1)[None]
+        device = 'cpu' if self.low_vram else self.device
+        tensor = tensor.to(device, dtype=self.pipe.dtype) / 255.
+        self._image_cache[key] = tensor
+        if len(self._image_cache) > 16:
+            self._image_cache.popitem(last=False)
+        return tensor
 
     def apply(self, image: ImageIO, text: str) -> ImageIO:
+        import torch
+
         prompt = f'{text}, {self.a_prompt}'
-        image = self.pipe(
-            prompt,
-            image.to_pil(),
-            num_inference_steps=20,
-            eta=0.0,
-            negative_prompt=self.n_prompt,
-            guidance_scale=9.0,
-        ).images[0]
+        with torch.inference_mode():
+            image = self.pipe(
+                prompt,
+                self._prepare_image(image),
+                num_inference_steps=self.inference_steps,
+                eta=0.0,
+                negative_prompt_embeds=self._negative_prompt_embeds,
+                guidance_scale=self.guidance_scale,
+            ).images[0]
         return ImageIO(image)
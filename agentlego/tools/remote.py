@@ -3,8 +3,6 @@ from io import BytesIO
 from typing import Dict, List, Optional, Union
 from urllib.parse import urljoin
 
-import requests
-
 from agentlego.parsers import DefaultParser
 from agentlego.schema import Parameter, ToolMeta
 from agentlego.tools.base import BaseTool
@@ -32,6 +30,8 @@ class RemoteTool(BaseTool):
         super().__init__(toolmeta, parser)
 
     def request_meta(self):
+        import requests
+
         url = urljoin(self.url, 'meta')
         response = requests.get(url).json()
         toolmeta = response['toolmeta']
@@ -42,6 +42,8 @@ class RemoteTool(BaseTool):
         return toolmeta, parameters
 
     def apply(self, *args, **kwargs):
+        import requests
+
         for arg, arg_name in zip(args, self.parameters):
             kwargs[arg_name] = arg
 
@@ -91,6 +93,8 @@ class RemoteTool(BaseTool):
 
     @classmethod
     def from_server(cls, url: str) -> List['RemoteTool']:
+        import requests
+
         response = requests.get(url).json()
         tools = []
         for tool_info in response:
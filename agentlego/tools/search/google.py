@@ -1,12 +1,20 @@
 import os
-from typing import Callable, List, Tuple, Union
-
-import requests
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple, Union
 
 from agentlego.parsers import DefaultParser
 from agentlego.schema import ToolMeta
+from agentlego.utils import is_package_available
 from ..base import BaseTool
 
+if is_package_available('orjson'):
+    from orjson import loads as json_loads
+else:
+    from json import loads as json_loads
+
 
 class GoogleSearch(BaseTool):
     """A tool to search on Google.
@@ -37,6 +45,10 @@ class GoogleSearch(BaseTool):
             Defaults to False.
         k (int): select first k results in the search results as response.
             Defaults to 10.
+        cache_size (int): The maximum number of successful search responses
+            to cache. Set to 0 to disable the cache. Defaults to 256.
+        cache_ttl (float, optional): The lifetime of a cached response in
+            seconds. Defaults to None, which means never expire.
     """
 
     result_key_for_type = {
@@ -62,7 +74,9 @@ class GoogleSearch(BaseTool):
                  search_type: str = 'search',
                  max_out_len: int = 1500,
                  with_url: bool = False,
-                 k: int = 10) -> None:
+                 k: int = 10,
+                 cache_size: int = 256,
+                 cache_ttl: Optional[float] = None) -> None:
         super().__init__(toolmeta=toolmeta, parser=parser)
 
         if api_key == 'env':
@@ -75,12 +89,18 @@ class GoogleSearch(BaseTool):
         self.api_key = api_key
         self.timeout = timeout
         self.search_type = search_type
+        self._result_key = self.result_key_for_type[search_type]
         self.k = k
         self.max_out_len = max_out_len
         self.with_url = with_url
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._session = None
 
     def apply(self, query: str) -> str:
-        status_code, results = self._search(
+        status_code, results = self._cached_search(
             query, search_type=self.search_type, k=self.k)
         # convert search results to ToolReturn format
         if status_code == 200:
@@ -89,6 +109,20 @@ class GoogleSearch(BaseTool):
         else:
             raise ConnectionError(f'Error {status_code}: {results}')
 
+    def batch_apply(self, queries: List[str]) -> List[str]:
+        """Search multiple queries concurrently.
+
+        Args:
+            queries (List[str]): The search queries.
+
+        Returns:
+            List[str]: The parsed search results of every query.
+        """
+        if len(queries) == 0:
+            return []
+        with ThreadPoolExecutor(max_workers=min(8, len(queries))) as pool:
+            return list(pool.map(self.apply, queries))
+
     def _parse_results(self, results: dict) -> Union[str, List[str]]:
         """Parse the search results from Serper API.
 
@@ -104,57 +138,109 @@ class GoogleSearch(BaseTool):
 
         answer_box = results.get('answerBox', {})
         if answer_box:
-            content = 'Answer box: '
+            parts = ['Answer box: ']
             if answer_box.get('answer'):
-                content += answer_box['answer']
+                parts.append(answer_box['answer'])
             elif answer_box.get('snippet'):
-                content += answer_box['snippet']
+                parts.append(answer_box['snippet'])
             elif answer_box.get('snippetHighlighted'):
-                content += answer_box['snippetHighlighted']
-            snippets.append(content)
+                parts.append(answer_box['snippetHighlighted'])
+            snippets.append(''.join(parts))
 
         kg = results.get('knowledgeGraph', {})
         if kg:
-            content = 'Knowledge graph: '
+            parts = ['Knowledge graph: ']
             if kg.get('title'):
-                content = kg['title'] + ' knowledge graph: '
+                parts = [kg['title'], ' knowledge graph: ']
             if kg.get('type'):
-                content += kg['type'] + '. '
+                parts.append(kg['type'] + '. ')
             if kg.get('description'):
-                content += kg['description']
+                parts.append(kg['description'])
             if kg.get('attributes'):
-                attributes = ', '.join(f'{k}: {v}'
-                                       for k, v in kg['attributes'].items())
-                content += f'({attributes})'
-            snippets.append(content)
-
-        for item in results[self.result_key_for_type[
-                self.search_type]][:self.k]:
-            content = ''
+                attributes = ', '.join(
+                    map(': '.join,
+                        ((k, str(v)) for k, v in kg['attributes'].items())))
+                parts.append(f'({attributes})')
+            snippets.append(''.join(parts))
+
+        for item in results[self._result_key][:self.k]:
+            parts = []
             if item.get('title'):
-                content += item['title'] + ': '
+                parts.append(item['title'] + ': ')
             if item.get('link') and self.with_url:
-                content += f"({item['link']})"
+                parts.append(f"({item['link']})")
             if item.get('snippet'):
-                content += item['snippet']
+                parts.append(item['snippet'])
             if item.get('attributes'):
-                attributes = ', '.join(f'{k}: {v}'
-                                       for k, v in item['attributes'].items())
-                content += f'({attributes})'
-            snippets.append(content)
+                attributes = ', '.join(
+                    map(': '.join,
+                        ((k, str(v)) for k, v in item['attributes'].items())))
+                parts.append(f'({attributes})')
+            snippets.append(''.join(parts))
 
         if len(snippets) == 0:
             return 'No good Google Search Result was found'
 
-        result = ''
+        # Stop formatting snippets once the length limit is exceeded.
+        total = 0
+        parts = []
         for idx, item in enumerate(snippets):
             item = item.strip().replace('\n', ' ')
-            result += f'{idx+1} - {item}\n\n'
+            part = f'{idx+1} - {item}\n\n'
+            total += len(part)
+            parts.append(part)
+            if total > self.max_out_len:
+                break
 
-        if len(result) > self.max_out_len:
+        result = ''.join(parts)
+        if total > self.max_out_len:
             result = result[:self.max_out_len] + '...'
         return result
 
+    def _cached_search(self, query: str, search_type: str,
+                       k: int) -> Tuple[int, Union[dict, str]]:
+        """Search with a LRU cache of the successful responses."""
+        key = (query, search_type, k)
+        with self._lock:
+            if key in self._cache:
+                timestamp, response = self._cache[key]
+                if (self.cache_ttl is None
+                        or time.monotonic() - timestamp < self.cache_ttl):
+                    self._cache.move_to_end(key)
+                    return 200, response
+                del self._cache[key]
+
+        status_code, response = self._search(
+            query, search_type=search_type, k=k)
+        if status_code == 200 and self.cache_size > 0:
+            with self._lock:
+                self._cache[key] = (time.monotonic(), response)
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return status_code, response
+
+    def _get_session(self):
+        """Get the HTTP session which reuses the connections to Serper API
+        among searches.
+
+        ``requests`` is imported here to avoid importing it when only
+        listing the tools.
+        """
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+
+                self._session = requests.Session()
+                self._session.mount(
+                    'https://',
+                    HTTPAdapter(
+                        pool_connections=16,
+                        pool_maxsize=16,
+                        max_retries=Retry(total=2, backoff_factor=0.2)))
+            return self._session
+
     def _search(self,
                 query: str,
                 search_type: str = 'search',
@@ -180,11 +266,11 @@ class GoogleSearch(BaseTool):
         params['q'] = query
 
         try:
-            response = requests.post(
+            response = self._get_session().post(
                 f'https://google.serper.dev/{search_type}',
                 headers=headers,
                 params=params,
                 timeout=self.timeout)
         except Exception as e:
             return -1, str(e)
-        return response.status_code, response.json()
+        return response.status_code, json_loads(response.content)
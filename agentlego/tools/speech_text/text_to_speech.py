@@ -1,8 +1,6 @@
 from io import BytesIO
 from typing import Callable, Union
 
-import requests
-
 from agentlego.parsers import DefaultParser
 from agentlego.schema import ToolMeta
 from agentlego.types import AudioIO
@@ -53,6 +51,7 @@ class TextToSpeech(BaseTool):
         self.model_name = model
 
         if isinstance(speaker_embeddings, str):
+            import requests
             with BytesIO(requests.get(speaker_embeddings).content) as f:
                 speaker_embeddings = torch.load(f, map_location=device)
         self.speaker_embeddings = speaker_embeddings
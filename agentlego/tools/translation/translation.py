@@ -1,8 +1,6 @@
 from typing import Callable, Union
 from urllib.parse import quote_plus
 
-import requests
-
 from agentlego.parsers import DefaultParser
 from agentlego.schema import ToolMeta
 from ..base import BaseTool
@@ -53,6 +51,8 @@ class Translation(BaseTool):
         return self._translate(text, source_lang, target_lang)
 
     def google_translate(self, text: str, source: str, target: str):
+        import requests
+
         text = quote_plus(text)
         url_tmpl = ('https://translate.googleapis.com/translate_a/'
                     'single?client=gtx&sl={}&tl={}&dt=at&dt=bd&dt=ex&'
@@ -1,86 +1,375 @@
+import copy
+import os
+import warnings
+from functools import wraps
 from typing import Optional
 
-from agentlego.utils import load_or_build_object
+from agentlego.utils import is_package_available, load_or_build_object, require
 
 
+def _cached(loader):
+    """Cache the pipeline built by a loader according to its arguments.
+
+    The base text-to-image pipeline is already cached and shared, and this
+    avoids rebuilding the derived ControlNet pipeline and moving it to the
+    device again on every call. Private pipelines are never cached.
+    """
+
+    @wraps(loader)
+    def wrapper(*args, **kwargs):
+        if kwargs.get('private', False):
+            return loader(*args, **kwargs)
+        return load_or_build_object(loader, *args, **kwargs)
+
+    return wrapper
+
+
+def _load_object(private: bool, constructor, *args, **kwargs):
+    """Build a private object, or get the object shared by the cache."""
+    if private:
+        return constructor(*args, **kwargs)
+    return load_or_build_object(constructor, *args, **kwargs)
+
+
+def _get_dtype(device):
+    """Get the inference dtype according to the device type."""
+    import torch
+
+    if device.type in ('cuda', 'mps', 'xpu'):
+        return torch.float16
+    if device.type == 'cpu':
+        # The AMX instructions accelerate bfloat16 matmul on Intel CPUs.
+        for name in ('_is_amx_tile_supported', '_is_amx_supported'):
+            is_amx_supported = getattr(torch.cpu, name, None)
+            if is_amx_supported is not None and is_amx_supported():
+                return torch.bfloat16
+    return torch.float32
+
+
+def _ipex_optimize(pipe, dtype):
+    """Optimize the UNet by Intel Extension for PyTorch on CPU.
+
+    The optimization is done on a copy, since the UNet is shared with other
+    cached pipelines.
+    """
+    import intel_extension_for_pytorch as ipex
+
+    pipe.unet = ipex.optimize(pipe.unet.eval(), dtype=dtype, inplace=False)
+
+
+def _enable_cuda_backends():
+    """Enable cuDNN auto-tuning and TF32 tensor cores for CUDA inference."""
+    import torch
+
+    torch.backends.cudnn.benchmark = True
+    torch.backends.cuda.matmul.allow_tf32 = True
+    torch.set_float32_matmul_precision('high')
+
+
+def _enable_efficient_attention(pipe, modules=('unet', ), xformers=False):
+    """Use the PyTorch 2 scaled dot product attention, or the xformers memory
+    efficient attention if ``xformers`` is True and it's available.
+
+    The xformers attention may break the full graph of ``torch.compile``
+    depending on its version, so only use it on pipelines which are never
+    compiled.
+    """
+    if xformers:
+        try:
+            pipe.enable_xformers_memory_efficient_attention()
+            return
+        except ImportError:
+            pass
+
+    from diffusers.models.attention_processor import AttnProcessor2_0
+    for name in modules:
+        getattr(pipe, name).set_attn_processor(AttnProcessor2_0())
+
+
+def _to_channels_last(pipe):
+    """Convert the convolution-heavy sub-modules to the channels last memory
+    format, which enables the faster NHWC convolution kernels."""
+    import torch
+
+    pipe.unet.to(memory_format=torch.channels_last)
+    pipe.vae.to(memory_format=torch.channels_last)
+    if getattr(pipe, 'controlnet', None) is not None:
+        pipe.controlnet.to(memory_format=torch.channels_last)
+
+
+def _get_trt_cache_dir(device):
+    """Get the directory to cache the built TensorRT engines, which is
+    separated by the architecture of the GPU to run the engines."""
+    import torch
+
+    major, minor = torch.cuda.get_device_capability(device)
+    cache_home = os.getenv('XDG_CACHE_HOME', '~/.cache')
+    return os.path.expanduser(
+        os.path.join(cache_home, 'agentlego', 'trt_engines',
+                     f'sm{major}{minor}'))
+
+
+def _compile_pipeline(pipe, backend: str = 'compile', device=None):
+    """Compile the compute-heavy sub-modules of a diffusers pipeline.
+
+    The sub-modules are shared with other cached pipelines, so the compiled
+    wrappers are only assigned to this pipeline, and the shared modules are
+    left untouched.
+
+    If ``backend`` is "trt", the UNet is compiled by Torch-TensorRT, and the
+    built engines are cached on the disk to skip building on later runs.
+    """
+    import torch
+
+    if backend == 'trt' and not is_package_available('torch_tensorrt'):
+        warnings.warn('The "trt" backend requires `torch_tensorrt`, '
+                      'fall back to the "compile" backend.')
+        backend = 'compile'
+
+    def _compile(module, backend='compile'):
+        if backend == 'trt':
+            import torch_tensorrt  # noqa: F401
+            return torch.compile(
+                module,
+                backend='tensorrt',
+                options={
+                    'enabled_precisions': {torch.half},
+                    'min_block_size': 1,
+                    'cache_built_engines': True,
+                    'reuse_cached_engines': True,
+                    'engine_cache_dir': _get_trt_cache_dir(device),
+                })
+        return torch.compile(module, mode='reduce-overhead', fullgraph=True)
+
+    pipe.unet = _compile(pipe.unet, backend)
+    if getattr(pipe, 'controlnet', None) is not None:
+        pipe.controlnet = _compile(pipe.controlnet)
+
+    # The pipeline calls `vae.decode` instead of `vae.forward`, so compile
+    # the method on a shallow copy which shares the weights with the
+    # original VAE.
+    vae = copy.copy(pipe.vae)
+    vae.decode = torch.compile(
+        vae.decode, mode='reduce-overhead', fullgraph=True)
+    pipe.vae = vae
+    return pipe
+
+
+@require('peft')
+def _fuse_lcm_lora(pipe, lcm_lora: str):
+    """Use the LCM scheduler and fuse the LCM-LoRA weights into the UNet,
+    which enables 1-4 steps inference."""
+    from diffusers import LCMScheduler
+
+    pipe.scheduler = LCMScheduler.from_config(pipe.scheduler.config)
+    pipe.load_lora_weights(lcm_lora)
+    # Keep the shared text encoders untouched.
+    pipe.fuse_lora(fuse_text_encoder=False)
+
+
+def _load_t2i(pipeline_cls,
+              model: str,
+              text_encoders: dict,
+              variant: Optional[str] = None,
+              vae: Optional[str] = None,
+              vae_variant: Optional[str] = None,
+              lcm_lora: Optional[str] = None,
+              torch_dtype=None,
+              private: bool = False,
+              **kwargs):
+    """Load a text-to-image pipeline.
+
+    The VAE and the text encoders are cached separately and shared by
+    reference among all pipelines of the same model, for example, the
+    pipelines with and without the LCM-LoRA, instead of loading a replica
+    for every pipeline.
+
+    If ``private`` is True, load new VAE and text encoders instead of the
+    shared ones.
+
+    If ``lcm_lora`` is specified, use the LCM scheduler and fuse the LCM-LoRA
+    weights into the UNet, which requires ``peft``.
+    """
+    from diffusers import AutoencoderKL
+
+    if vae is None:
+        vae = _load_object(
+            private,
+            AutoencoderKL.from_pretrained,
+            model,
+            subfolder='vae',
+            torch_dtype=torch_dtype,
+            variant=variant,
+            use_safetensors=True,
+        )
+    else:
+        vae = _load_object(
+            private,
+            AutoencoderKL.from_pretrained,
+            vae,
+            torch_dtype=torch_dtype,
+            variant=vae_variant,
+        )
+
+    for name, encoder_cls in text_encoders.items():
+        kwargs[name] = _load_object(
+            private,
+            encoder_cls.from_pretrained,
+            model,
+            subfolder=name,
+            torch_dtype=torch_dtype,
+            variant=variant,
+            use_safetensors=True,
+        )
+
+    pipe = pipeline_cls.from_pretrained(
+        model,
+        vae=vae,
+        torch_dtype=torch_dtype,
+        variant=variant,
+        use_safetensors=True,
+        **kwargs,
+    )
+    if lcm_lora is not None:
+        _fuse_lcm_lora(pipe, lcm_lora)
+    return pipe
+
+
+@_cached
 def load_sd(model: str = 'runwayml/stable-diffusion-v1-5',
             variant: Optional[str] = 'fp16',
             vae: Optional[str] = None,
             vae_variant: Optional[str] = None,
             controlnet: Optional[str] = None,
             controlnet_variant: Optional[str] = None,
+            scheduler: Optional[str] = None,
+            safety_checker: bool = True,
+            backend: str = 'compile',
+            private: bool = False,
             device=None):
     import torch
-    from diffusers import (AutoencoderKL, ControlNetModel,
-                           StableDiffusionControlNetPipeline,
+    from diffusers import (ControlNetModel, StableDiffusionControlNetPipeline,
                            StableDiffusionPipeline)
+    from transformers import CLIPTextModel
 
-    dtype = torch.float16 if 'cuda' in str(device) else torch.float32
+    assert scheduler in [None, 'lcm']
+    assert backend in ['eager', 'compile', 'trt']
+    device = torch.device(device or 'cpu')
+    dtype = _get_dtype(device)
+    if device.type == 'cuda':
+        _enable_cuda_backends()
+    # Skip loading the safety checker unless it's required.
+    extra_kwargs = {} if safety_checker else dict(
+        safety_checker=None, requires_safety_checker=False)
 
-    if vae is not None:
-        vae = load_or_build_object(
-            AutoencoderKL.from_pretrained,
-            vae,
-            torch_dtype=dtype,
-            variant=vae_variant,
-        )
-
-    t2i = load_or_build_object(
-        StableDiffusionPipeline.from_pretrained,
+    lcm_lora = None
+    if scheduler == 'lcm':
+        lcm_lora = 'latent-consistency/lcm-lora-sdv1-5'
+    t2i = _load_object(
+        private,
+        _load_t2i,
+        StableDiffusionPipeline,
         model,
+        text_encoders={'text_encoder': CLIPTextModel},
+        variant=variant,
         vae=vae,
+        vae_variant=vae_variant,
+        lcm_lora=lcm_lora,
         torch_dtype=dtype,
-        variant=variant,
+        private=private,
+        **extra_kwargs,
     )
 
+    # Always build a new pipeline on the cached components, so that the
+    # optimizations below never modify the cached text-to-image pipeline.
     if controlnet is None:
-        return t2i.to(device)
+        pipe = StableDiffusionPipeline(
+            **t2i.components, requires_safety_checker=safety_checker)
     else:
-        controlnet = load_or_build_object(
+        controlnet = _load_object(
+            private,
             ControlNetModel.from_pretrained,
             controlnet,
             torch_dtype=dtype,
             variant=controlnet_variant,
         )
         pipe = StableDiffusionControlNetPipeline(
-            **t2i.components, controlnet=controlnet)
-        return pipe.to(device)
+            **t2i.components,
+            controlnet=controlnet,
+            requires_safety_checker=safety_checker)
+
+    # A private pipeline doesn't share any module with other pipelines, and
+    # is left on CPU for the caller to manage the device placement, like
+    # model CPU offloading.
+    if not private:
+        pipe = pipe.to(device)
+
+    if device.type == 'cuda':
+        # The attention processors are set on the modules, which are shared
+        # with the compiled pipelines unless the pipeline is private.
+        _enable_efficient_attention(pipe, xformers=private)
+        _to_channels_last(pipe)
+    if backend == 'eager' or private:
+        return pipe
+    if device.type == 'cuda' and hasattr(torch, 'compile'):
+        pipe = _compile_pipeline(pipe, backend, device)
+    elif device.type == 'cpu' and is_package_available(
+            'intel_extension_for_pytorch'):
+        _ipex_optimize(pipe, dtype)
+    return pipe
 
 
+@_cached
 def load_sdxl(model: str = 'stabilityai/stable-diffusion-xl-base-1.0',
               variant: Optional[str] = 'fp16',
               vae: Optional[str] = 'madebyollin/sdxl-vae-fp16-fix',
               vae_variant: Optional[str] = None,
               controlnet: Optional[str] = None,
               controlnet_variant: Optional[str] = None,
+              scheduler: Optional[str] = None,
+              backend: str = 'compile',
+              private: bool = False,
               device=None):
     import torch
-    from diffusers import (AutoencoderKL, ControlNetModel,
+    from diffusers import (ControlNetModel,
                            StableDiffusionXLControlNetPipeline,
                            StableDiffusionXLPipeline)
+    from transformers import CLIPTextModel, CLIPTextModelWithProjection
 
-    dtype = torch.float16 if 'cuda' in str(device) else torch.float32
+    assert scheduler in [None, 'lcm']
+    assert backend in ['eager', 'compile', 'trt']
+    device = torch.device(device or 'cpu')
+    dtype = _get_dtype(device)
+    if device.type == 'cuda':
+        _enable_cuda_backends()
 
-    if vae is not None:
-        vae = load_or_build_object(
-            AutoencoderKL.from_pretrained,
-            vae,
-            torch_dtype=dtype,
-            variant=vae_variant,
-        )
-
-    t2i = load_or_build_object(
-        StableDiffusionXLPipeline.from_pretrained,
+    lcm_lora = None
+    if scheduler == 'lcm':
+        lcm_lora = 'latent-consistency/lcm-lora-sdxl'
+    t2i = _load_object(
+        private,
+        _load_t2i,
+        StableDiffusionXLPipeline,
         model,
+        text_encoders={
+            'text_encoder': CLIPTextModel,
+            'text_encoder_2': CLIPTextModelWithProjection,
+        },
+        variant=variant,
         vae=vae,
+        vae_variant=vae_variant,
+        lcm_lora=lcm_lora,
         torch_dtype=dtype,
-        variant=variant,
+        private=private,
     )
 
+    # Always build a new pipeline on the cached components, so that the
+    # optimizations below never modify the cached text-to-image pipeline.
     if controlnet is None:
-        return t2i.to(device)
+        pipe = StableDiffusionXLPipeline(**t2i.components)
     else:
-        controlnet = load_or_build_object(
+        controlnet = _load_object(
+            private,
             ControlNetModel.from_pretrained,
             controlnet,
             torch_dtype=dtype,
@@ -88,4 +377,24 @@ def load_sdxl(model: str = 'stabilityai/stable-diffusion-xl-base-1.0',
         )
         pipe = StableDiffusionXLControlNetPipeline(
             **t2i.components, controlnet=controlnet)
-        return pipe.to(device)
+
+    # A private pipeline doesn't share any module with other pipelines, and
+    # is left on CPU for the caller to manage the device placement, like
+    # model CPU offloading.
+    if not private:
+        pipe = pipe.to(device)
+
+    if device.type == 'cuda':
+        # The attention processors are set on the modules, which are shared
+        # with the compiled pipelines unless the pipeline is private.
+        _enable_efficient_attention(
+            pipe, modules=('unet', 'vae'), xformers=private)
+        _to_channels_last(pipe)
+    if backend == 'eager' or private:
+        return pipe
+    if device.type == 'cuda' and hasattr(torch, 'compile'):
+        pipe = _compile_pipeline(pipe, backend, device)
+    elif device.type == 'cpu' and is_package_available(
+            'intel_extension_for_pytorch'):
+        _ipex_optimize(pipe, dtype)
+    return pipe
@@ -1,4 +1,8 @@
-from typing import Callable, Union
+import os
+from functools import lru_cache
+from typing import Callable, List, Union
+
+import numpy as np
 
 from agentlego.parsers import DefaultParser
 from agentlego.schema import ToolMeta
@@ -7,6 +11,19 @@ from agentlego.utils import load_or_build_object, require
 from ..base import BaseTool
 
 
+@lru_cache(maxsize=8)
+def _read_image(path: str, mtime: int) -> np.ndarray:
+    """Read an image file as a BGR array.
+
+    The decoded images are cached by the file path and the modification
+    time, since an agent usually asks multiple questions about one image.
+    The cached array is shared by all callers and is therefore read-only.
+    """
+    image = ImageIO(path).to_array()[:, :, ::-1]
+    image.setflags(write=False)
+    return image
+
+
 class VisualQuestionAnswering(BaseTool):
     """A tool to answer the question about an image.
 
@@ -46,6 +63,40 @@ class VisualQuestionAnswering(BaseTool):
                 model=self.model,
                 device=self.device)
 
+    def _load_image(self, image: ImageIO) -> np.ndarray:
+        if image.type == 'path':
+            path = os.path.abspath(image.to_path())
+            return _read_image(path, os.stat(path).st_mtime_ns)
+        return image.to_array()[:, :, ::-1]
+
     def apply(self, image: ImageIO, text: str) -> str:
-        image = image.to_array()[:, :, ::-1]
+        image = self._load_image(image)
         return self._inferencer(image, text)[0]['pred_answer']
+
+    def batch_apply(self,
+                    image: ImageIO,
+                    questions: List[str],
+                    batch_size: int = 4) -> List[str]:
+        """Answer multiple questions about the same image in batches.
+
+        Args:
+            image (ImageIO): The image to ask about.
+            questions (List[str]): The questions about the image.
+            batch_size (int): The maximum number of questions in one forward
+                pass. Defaults to 4.
+
+        Returns:
+            List[str]: The answers of every question.
+        """
+        if not self._is_setup:
+            self.setup()
+            self._is_setup = True
+
+        if len(questions) == 0:
+            return []
+        image = self._load_image(image)
+        results = self._inferencer(
+            [image] * len(questions),
+            questions,
+            batch_size=min(batch_size, len(questions)))
+        return [result['pred_answer'] for result in results]
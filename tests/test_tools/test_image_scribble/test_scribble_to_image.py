@@ -1,6 +1,5 @@
 import os.path as osp
 
-import cv2
 import numpy as np
 from PIL import Image
 
@@ -12,6 +11,8 @@ from agentlego.tools.parsers import HuggingFaceAgentParser, LangChainParser
 class TestScribbleTextToImage(ToolTestCase):
 
     def test_all(self):
+        import cv2
+
         tool = load_tool(
             'ScribbleTextToImage', parser=LangChainParser(), device='cuda')
         img = np.ones([224, 224, 3]).astype(np.uint8)
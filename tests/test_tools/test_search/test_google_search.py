@@ -0,0 +1,221 @@
+import random
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from agentlego.tools import GoogleSearch
+from agentlego.tools.search import google
+
+
+def fake_results(query):
+    return {'organic': [{'title': query, 'snippet': f'snippet of {query}'}]}
+
+
+class FakeSearch:
+    """Record the queries and return the given status codes in turn."""
+
+    def __init__(self, status_codes=()):
+        self.queries = []
+        self.status_codes = list(status_codes)
+
+    def __call__(self, query, search_type='search', **kwargs):
+        self.queries.append(query)
+        status_code = self.status_codes.pop(0) if self.status_codes else 200
+        if status_code != 200:
+            return status_code, f'error of {query}'
+        return status_code, fake_results(query)
+
+
+def build_tool(**kwargs):
+    tool = GoogleSearch(api_key='dummy', **kwargs)
+    tool._search = FakeSearch()
+    return tool
+
+
+def test_cache_hit():
+    tool = build_tool()
+    assert tool.apply('a') == tool.apply('a')
+    assert tool._search.queries == ['a']
+
+
+def test_cache_lru_bound():
+    tool = build_tool(cache_size=2)
+    for query in ['a', 'b', 'a', 'c']:
+        tool.apply(query)
+    # `b` is the least recently used one and is evicted by `c`.
+    assert list(tool._cache) == [('a', 'search', 10), ('c', 'search', 10)]
+    tool.apply('a')
+    tool.apply('b')
+    assert tool._search.queries == ['a', 'b', 'c', 'b']
+
+
+def test_cache_ttl(monkeypatch):
+    now = [0.]
+    monkeypatch.setattr(google, 'time',
+                        SimpleNamespace(monotonic=lambda: now[0]))
+    tool = build_tool(cache_ttl=10)
+    tool.apply('a')
+    now[0] = 9.
+    tool.apply('a')
+    assert tool._search.queries == ['a']
+    now[0] = 20.
+    tool.apply('a')
+    assert tool._search.queries == ['a', 'a']
+
+
+def test_error_not_cached():
+    tool = build_tool()
+    tool._search = FakeSearch(status_codes=[500])
+    with pytest.raises(ConnectionError):
+        tool.apply('a')
+    assert len(tool._cache) == 0
+    tool.apply('a')
+    tool.apply('a')
+    assert tool._search.queries == ['a', 'a']
+
+
+def test_cache_disabled():
+    tool = build_tool(cache_size=0)
+    tool.apply('a')
+    tool.apply('a')
+    assert len(tool._cache) == 0
+    assert tool._search.queries == ['a', 'a']
+
+
+def reference_parse_results(tool, results):
+    """The original string-concatenation implementation of
+    ``GoogleSearch._parse_results``."""
+    snippets = []
+
+    answer_box = results.get('answerBox', {})
+    if answer_box:
+        content = 'Answer box: '
+        if answer_box.get('answer'):
+            content += answer_box['answer']
+        elif answer_box.get('snippet'):
+            content += answer_box['snippet']
+        elif answer_box.get('snippetHighlighted'):
+            content += answer_box['snippetHighlighted']
+        snippets.append(content)
+
+    kg = results.get('knowledgeGraph', {})
+    if kg:
+        content = 'Knowledge graph: '
+        if kg.get('title'):
+            content = kg['title'] + ' knowledge graph: '
+        if kg.get('type'):
+            content += kg['type'] + '. '
+        if kg.get('description'):
+            content += kg['description']
+        if kg.get('attributes'):
+            attributes = ', '.join(f'{k}: {v}'
+                                   for k, v in kg['attributes'].items())
+            content += f'({attributes})'
+        snippets.append(content)
+
+    for item in results['organic'][:tool.k]:
+        content = ''
+        if item.get('title'):
+            content += item['title'] + ': '
+        if item.get('link') and tool.with_url:
+            content += f"({item['link']})"
+        if item.get('snippet'):
+            content += item['snippet']
+        if item.get('attributes'):
+            attributes = ', '.join(f'{k}: {v}'
+                                   for k, v in item['attributes'].items())
+            content += f'({attributes})'
+        snippets.append(content)
+
+    if len(snippets) == 0:
+        return 'No good Google Search Result was found'
+
+    result = ''
+    for idx, item in enumerate(snippets):
+        item = item.strip().replace('\n', ' ')
+        result += f'{idx+1} - {item}\n\n'
+
+    if len(result) > tool.max_out_len:
+        result = result[:tool.max_out_len] + '...'
+    return result
+
+
+def random_payload(rng):
+
+    def text():
+        words = [
+            rng.choice(['foo', 'bar', ' ', '\n', 'baz qux'])
+            for _ in range(rng.randint(0, 40))
+        ]
+        return ''.join(words)
+
+    def attributes():
+        return {
+            text() or 'key': rng.choice([text(), rng.randint(0, 100)])
+            for _ in range(rng.randint(0, 5))
+        }
+
+    def maybe(fn):
+        return fn() if rng.random() < 0.5 else None
+
+    results = {'organic': []}
+    if rng.random() < 0.5:
+        results['answerBox'] = {
+            key: maybe(text)
+            for key in ['answer', 'snippet', 'snippetHighlighted']
+        }
+    if rng.random() < 0.5:
+        results['knowledgeGraph'] = {
+            'title': maybe(text),
+            'type': maybe(text),
+            'description': maybe(text),
+            'attributes': maybe(attributes),
+        }
+    for _ in range(rng.randint(0, 15)):
+        results['organic'].append({
+            'title': maybe(text),
+            'link': maybe(text),
+            'snippet': maybe(text),
+            'attributes': maybe(attributes),
+        })
+    return results
+
+
+def test_parse_results():
+    rng = random.Random(0)
+    for _ in range(3000):
+        tool = GoogleSearch(
+            api_key='dummy',
+            max_out_len=rng.randint(1, 3000),
+            with_url=rng.random() < 0.5,
+            k=rng.randint(1, 12))
+        results = random_payload(rng)
+        assert tool._parse_results(results) == reference_parse_results(
+            tool, results)
+
+
+def test_batch_apply():
+    tool = build_tool()
+    search = tool._search
+
+    def slow_search(query, **kwargs):
+        # Finish the queries in a random order.
+        time.sleep(random.random() * 0.01)
+        return search(query, **kwargs)
+
+    tool._search = slow_search
+    queries = [f'query {i}' for i in range(20)]
+    results = tool.batch_apply(queries)
+    assert results == [
+        tool._parse_results(fake_results(query)) for query in queries
+    ]
+    assert sorted(search.queries) == sorted(queries)
+    assert tool.batch_apply([]) == []
+
+
+def test_batch_apply_error():
+    tool = build_tool(cache_size=0)
+    tool._search = FakeSearch(status_codes=[200, 500, 200])
+    with pytest.raises(ConnectionError, match='Error 500'):
+        tool.batch_apply(['a', 'b', 'c'])
@@ -21,6 +21,16 @@ def test_call(tool):
     assert isinstance(tool(ImageIO(str(test_image)), 'prompt'), str)
 
 
+def test_batch_apply(tool):
+    if not hasattr(tool, 'batch_apply'):
+        pytest.skip('The remote tool does not support `batch_apply`.')
+    questions = ['What is it?', 'What color is it?', 'Is it a cat?']
+    answers = tool.batch_apply(
+        ImageIO(str(test_image)), questions, batch_size=2)
+    assert len(answers) == len(questions)
+    assert all(isinstance(answer, str) for answer in answers)
+
+
 def test_hf_agent(tool, hf_agent):
     tool = tool.to_transformers_agent()
     hf_agent.prepare_for_new_chat()